@@ -0,0 +1,15 @@
+"""
+Makes the project importable from the benchmark scripts, and sets up Django.
+
+Import this before importing anything from the project.
+"""
+import os
+import sys
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "nurseconnect_registration.benchmarksettings"
+)
+django.setup()
@@ -0,0 +1,271 @@
+"""
+Load tests the registration funnel (details, confirm clinic, success) against
+local stand-ins for RapidPro, OpenHIM and WhatsApp.
+
+By default this starts the app with the given command, pointed at the fake
+upstreams, and drives concurrent registrations through it. The app uses
+nurseconnect_registration.benchmarksettings unless DJANGO_SETTINGS_MODULE is set.
+To test an app that is already running, pass --url, and point that app at a fake
+upstream server started with benchmarks/upstreams.py.
+
+The throughput, errors, and p50/p95/p99 latency of each step are printed as JSON,
+and optionally written to a file, so that runs can be compared across commits.
+
+Usage:
+    python benchmarks/funnel.py --registrations 500 --concurrency 20 \\
+        --command "gunicorn -w 4 -b 127.0.0.1:{port} nurseconnect_registration.wsgi" \\
+        --latency openhim=0.2 --output results.json
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+from upstreams import UpstreamServer, add_upstream_arguments, parse_upstream_values
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF_REGEX = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+DEFAULT_COMMAND = "{python} manage.py runserver --noreload 127.0.0.1:{port}"
+DEFAULT_SETTINGS = "nurseconnect_registration.benchmarksettings"
+
+
+class StepFailed(Exception):
+    pass
+
+
+def percentile(values, percent):
+    """
+    Nearest rank percentile of the sorted list of values
+    """
+    if not values:
+        return None
+    index = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarise(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+class Funnel(object):
+    """
+    Runs registrations through the funnel, recording the latency of each step
+    """
+
+    def __init__(self, url, clinic_code):
+        self.url = url
+        self.clinic_code = clinic_code
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def step(self, name, session, method, path, expected_status, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                method, urljoin(self.url, path), allow_redirects=False, **kwargs
+            )
+        except requests.RequestException as e:
+            with self.lock:
+                self.errors[name] += 1
+            raise StepFailed(str(e))
+        duration = time.perf_counter() - start
+
+        with self.lock:
+            if response.status_code != expected_status:
+                self.errors[name] += 1
+                raise StepFailed("{} returned {}".format(name, response.status_code))
+            self.latencies[name].append(duration)
+        return response
+
+    def csrf_token(self, response):
+        match = CSRF_REGEX.search(response.text)
+        return match.group(1) if match else ""
+
+    def register(self, index):
+        msisdn = "082{:07d}".format(index % 10 ** 7)
+        with requests.Session() as session:
+            try:
+                r = self.step("details_get", session, "GET", "/", 200)
+                r = self.step(
+                    "details_post",
+                    session,
+                    "POST",
+                    "/",
+                    302,
+                    data={
+                        "csrfmiddlewaretoken": self.csrf_token(r),
+                        "msisdn": msisdn,
+                        "clinic_code": self.clinic_code,
+                        "consent": "True",
+                    },
+                )
+                r = self.step(
+                    "confirm_clinic_get", session, "GET", "confirm_clinic", 200
+                )
+                self.step(
+                    "confirm_clinic_post",
+                    session,
+                    "POST",
+                    "confirm_clinic",
+                    302,
+                    data={"csrfmiddlewaretoken": self.csrf_token(r), "yes": "Yes"},
+                )
+                self.step("success_get", session, "GET", "success", 200)
+            except StepFailed:
+                return False
+        return True
+
+    def run(self, registrations, concurrency, offset):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(
+                pool.map(self.register, range(offset, offset + registrations))
+            )
+        elapsed = time.perf_counter() - start
+        completed = sum(results)
+        return {
+            "registrations": registrations,
+            "completed": completed,
+            "elapsed": elapsed,
+            "registrations_per_second": completed / elapsed,
+            "errors": dict(self.errors),
+            "steps": {name: summarise(l) for name, l in self.latencies.items()},
+        }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_app(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("App exited with code {}".format(process.returncode))
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("App did not start within {} seconds".format(timeout))
+
+
+def app_environ(upstream):
+    """
+    The environment to run the app or workers in, pointed at the fake upstreams
+    """
+    env = dict(os.environ, **upstream.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", DEFAULT_SETTINGS)
+    # Without a broker, publishing the registration tasks would block
+    env.setdefault("CELERY_BROKER_URL", "memory://")
+    return env
+
+
+def start_app(command, upstream):
+    port = free_port()
+    env = app_environ(upstream)
+    subprocess.check_call(
+        [sys.executable, "manage.py", "migrate", "--noinput", "-v", "0"],
+        cwd=ROOT,
+        env=env,
+    )
+    process = subprocess.Popen(
+        shlex.split(command.format(python=sys.executable, port=port)),
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = "http://127.0.0.1:{}/".format(port)
+    try:
+        wait_for_app(url, process)
+    except Exception:
+        process.terminate()
+        raise
+    return url, process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--registrations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--url", help="URL of an already running app, instead of starting one"
+    )
+    parser.add_argument(
+        "--command",
+        default=DEFAULT_COMMAND,
+        help="Command to start the app, {port} and {python} are filled in",
+    )
+    parser.add_argument("--clinic-code", default="123457")
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=int(time.time()) % 10 ** 7,
+        help="Start of the MSISDN range, so that repeat runs don't hit the dedupe",
+    )
+    parser.add_argument("--output", help="File to write the JSON results to")
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    latency = parse_upstream_values(args.latency)
+    error_rate = parse_upstream_values(args.error_rate)
+    upstream = UpstreamServer(latency=latency, error_rate=error_rate).start()
+
+    process = None
+    url = args.url
+    if url is None:
+        url, process = start_app(args.command, upstream)
+
+    try:
+        funnel = Funnel(url, args.clinic_code)
+        results = funnel.run(args.registrations, args.concurrency, args.offset)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        upstream.shutdown()
+
+    results["config"] = {
+        "url": args.url,
+        "command": None if args.url else args.command,
+        "concurrency": args.concurrency,
+        "latency": latency,
+        "error_rate": error_rate,
+        "settings": None
+        if args.url
+        else os.environ.get("DJANGO_SETTINGS_MODULE", DEFAULT_SETTINGS),
+    }
+    results["upstream_requests"] = {
+        "{}.{}.{}".format(*key): count for key, count in upstream.counts.items()
+    }
+    output = json.dumps(results, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
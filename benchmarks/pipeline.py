@@ -0,0 +1,302 @@
+"""
+Measures how the registration tasks drain a backlog, against local stand-ins for
+RapidPro and OpenHIM.
+
+A backlog of registrations is queued, then Celery workers are started with the
+given pool, concurrency and prefetch multiplier, and left to send every
+registration to RapidPro and then OpenHIM. The broker is kombu's filesystem
+transport in a temporary directory, so no broker server is needed, and the pool
+processes of every worker share the same queue.
+
+It reports the drain time, registrations and task runs per second, the retry
+amplification (task runs per task, including retries caused by upstream errors),
+and the peak memory of each worker and its pool processes. Memory is read from
+/proc, so is only reported on Linux.
+
+Usage:
+    python benchmarks/pipeline.py --registrations 1000 --workers 2 --pool prefork \\
+        --concurrency 8 --prefetch-multiplier 4 --error-rate openhim=0.05
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from celery import chain
+
+import bootstrap  # noqa: F401
+from funnel import DEFAULT_SETTINGS, ROOT, app_environ
+from nurseconnect_registration.celery import app
+from registrations.tasks import (
+    send_registration_to_openhim,
+    send_registration_to_rapidpro,
+)
+from upstreams import UpstreamServer, add_upstream_arguments, parse_upstream_values
+
+
+def registration(index):
+    msisdn = "+2782{:07d}".format(index % 10 ** 7)
+    timestamp = int(datetime.utcnow().timestamp())
+    return chain(
+        send_registration_to_rapidpro.s(
+            msisdn=msisdn,
+            referral_msisdn=None,
+            channel="SMS",
+            clinic_code="123457",
+            timestamp=timestamp,
+        ),
+        send_registration_to_openhim.s(
+            referral_msisdn=None,
+            channel="SMS",
+            clinic_code="123457",
+            persal=None,
+            sanc=None,
+            timestamp=timestamp,
+            eid=str(uuid.uuid4()),
+        ),
+    )
+
+
+def broker_options(folder):
+    return {
+        "data_folder_in": folder,
+        "data_folder_out": folder,
+        "polling_interval": 0.1,
+    }
+
+
+def process_tree(pid):
+    """
+    The PIDs of the process and all of its descendants
+    """
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open("/proc/{}/stat".format(entry)) as f:
+                # The command name can contain spaces, so split after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(parents.get(current, []))
+    return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class Workers(object):
+    """
+    Runs the Celery workers, and tracks their peak memory usage
+    """
+
+    def __init__(self, count, pool, concurrency, prefetch_multiplier, env):
+        self.processes = [
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "celery",
+                    "-A",
+                    "nurseconnect_registration",
+                    "worker",
+                    "--pool",
+                    pool,
+                    "--concurrency",
+                    str(concurrency),
+                    "--prefetch-multiplier",
+                    str(prefetch_multiplier),
+                    "--hostname",
+                    "benchmark{}@%h".format(i),
+                    "--loglevel",
+                    "error",
+                    "--without-gossip",
+                    "--without-mingle",
+                    "--without-heartbeat",
+                ],
+                cwd=ROOT,
+                env=env,
+                stdout=subprocess.DEVNULL,
+            )
+            for i in range(count)
+        ]
+        self.peak_rss = [0] * count
+        self.peak_processes = [0] * count
+
+    def sample_memory(self):
+        for i, process in enumerate(self.processes):
+            pids = process_tree(process.pid)
+            self.peak_rss[i] = max(self.peak_rss[i], sum(map(rss_bytes, pids)))
+            self.peak_processes[i] = max(self.peak_processes[i], len(pids))
+
+    def check_running(self):
+        for process in self.processes:
+            if process.poll() is not None:
+                raise RuntimeError(
+                    "Worker exited with code {}".format(process.returncode)
+                )
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def task_runs(counts):
+    """
+    Every run of the RapidPro task starts by looking up the contact, and every run
+    of the OpenHIM task makes one subscription request
+    """
+    return {
+        "send_registration_to_rapidpro": counts[
+            ("rapidpro", "get_contacts", "request")
+        ],
+        "send_registration_to_openhim": counts[("openhim", "subscription", "request")],
+    }
+
+
+def completed(counts):
+    return (
+        counts[("openhim", "subscription", "request")]
+        - counts[("openhim", "subscription", "error")]
+    )
+
+
+def run(args, upstream, folder):
+    start = time.perf_counter()
+    with app.connection_for_write() as conn:
+        for index in range(args.offset, args.offset + args.registrations):
+            registration(index).apply_async(connection=conn)
+    publish_time = time.perf_counter() - start
+
+    env = app_environ(upstream)
+    # The broker transport options are only read from the environment by the
+    # benchmark settings
+    env["DJANGO_SETTINGS_MODULE"] = DEFAULT_SETTINGS
+    env["CELERY_BROKER_URL"] = "filesystem://"
+    env["CELERY_BROKER_TRANSPORT_OPTIONS"] = json.dumps(broker_options(folder))
+    workers = Workers(
+        args.workers, args.pool, args.concurrency, args.prefetch_multiplier, env
+    )
+
+    first_request = None
+    deadline = time.perf_counter() + args.timeout
+    try:
+        while completed(upstream.counts) < args.registrations:
+            if time.perf_counter() > deadline:
+                raise RuntimeError(
+                    "Only {} of {} registrations completed within {} seconds".format(
+                        completed(upstream.counts), args.registrations, args.timeout
+                    )
+                )
+            workers.check_running()
+            workers.sample_memory()
+            if first_request is None and sum(upstream.counts.values()):
+                first_request = time.perf_counter()
+            time.sleep(0.05)
+        drain_time = time.perf_counter() - (first_request or start)
+        workers.sample_memory()
+    finally:
+        workers.stop()
+
+    runs = task_runs(upstream.counts)
+    total_runs = sum(runs.values())
+    return {
+        "registrations": args.registrations,
+        "publish_seconds": publish_time,
+        "drain_seconds": drain_time,
+        "registrations_per_second": args.registrations / drain_time,
+        "task_runs_per_second": total_runs / drain_time,
+        "task_runs": runs,
+        "retry_amplification": total_runs / (2 * args.registrations),
+        "workers": [
+            {"peak_rss_mb": rss / 2 ** 20, "peak_processes": processes}
+            for rss, processes in zip(workers.peak_rss, workers.peak_processes)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--registrations", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--pool", default="prefork", choices=["prefork", "solo", "eventlet", "gevent"]
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--prefetch-multiplier", type=int, default=4)
+    parser.add_argument(
+        "--timeout", type=int, default=600, help="Seconds to wait for the drain"
+    )
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="Start of the range of MSISDNs to register",
+    )
+    parser.add_argument("--output", help="File to write the JSON results to")
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    latency = parse_upstream_values(args.latency)
+    error_rate = parse_upstream_values(args.error_rate)
+    upstream = UpstreamServer(latency=latency, error_rate=error_rate).start()
+    folder = tempfile.mkdtemp(prefix="nurseconnect-registration-broker-")
+    app.conf.update(
+        CELERY_BROKER_URL="filesystem://",
+        CELERY_BROKER_TRANSPORT_OPTIONS=broker_options(folder),
+        CELERY_TASK_ALWAYS_EAGER=False,
+    )
+
+    try:
+        results = run(args, upstream, folder)
+    finally:
+        upstream.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    results["config"] = {
+        "workers": args.workers,
+        "pool": args.pool,
+        "concurrency": args.concurrency,
+        "prefetch_multiplier": args.prefetch_multiplier,
+        "latency": latency,
+        "error_rate": error_rate,
+    }
+    results["upstream_requests"] = {
+        "{}.{}.{}".format(*key): count for key, count in upstream.counts.items()
+    }
+    output = json.dumps(results, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Compares the registration task messages before and after the switch to compact,
+msgpack serialized task arguments.
+
+For each payload it reports the size of the message body published to the broker,
+and how many messages per second can be published to and consumed from an
+in-memory broker.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=nurseconnect_registration.testsettings \\
+        python benchmarks/task_payloads.py --messages 5000
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from celery import chain
+
+import bootstrap  # noqa: F401
+from nurseconnect_registration.celery import app
+from registrations.tasks import (
+    send_registration_to_openhim,
+    send_registration_to_rapidpro,
+)
+
+# A contact as returned by RapidPro, which is what used to be put in the task chain
+CONTACT = {
+    "uuid": "89341938-7c98-4c8e-bc9d-7cd8c9cfc468",
+    "name": "Test User",
+    "language": None,
+    "urns": ["tel:+27820001001", "whatsapp:27820001001"],
+    "groups": [
+        {"name": "opted-out", "uuid": "5a4eb79e-1b1f-4ae3-8700-09384cca385f"},
+        {"name": "nurseconnect-sms", "uuid": "c2b3d6e1-5b6a-4f77-9d6d-9e1a3c6c4f0d"},
+    ],
+    "fields": {
+        "persal": "11223344",
+        "opt_out_date": "2018-06-01T00:00:00.000000Z",
+        "registered_by": "+27820001002",
+        "facility_code": "123457",
+        "registration_date": "2018-01-01T00:00:00.000000Z",
+        "preferred_channel": "sms",
+        "sanc": "55667788",
+    },
+    "blocked": False,
+    "stopped": False,
+    "created_on": "2018-01-01T00:00:00.000000Z",
+    "modified_on": "2018-06-01T00:00:00.000000Z",
+}
+
+
+def old_payload():
+    return chain(
+        send_registration_to_rapidpro.s(
+            contact=CONTACT,
+            msisdn="+27820001001",
+            referral_msisdn="+27820001002",
+            channel="SMS",
+            clinic_code="123457",
+            timestamp=datetime.utcnow().timestamp(),
+        ).set(serializer="json"),
+        send_registration_to_openhim.s(
+            referral_msisdn="+27820001002",
+            channel="SMS",
+            clinic_code="123457",
+            persal=CONTACT["fields"]["persal"],
+            sanc=CONTACT["fields"]["sanc"],
+            timestamp=datetime.utcnow().timestamp(),
+            eid=uuid.uuid4(),
+        ).set(serializer="json"),
+    )
+
+
+def new_payload():
+    timestamp = int(datetime.utcnow().timestamp())
+    return chain(
+        send_registration_to_rapidpro.s(
+            msisdn="+27820001001",
+            referral_msisdn="+27820001002",
+            channel="SMS",
+            clinic_code="123457",
+            timestamp=timestamp,
+        ),
+        send_registration_to_openhim.s(
+            referral_msisdn="+27820001002",
+            channel="SMS",
+            clinic_code="123457",
+            persal=CONTACT["fields"]["persal"],
+            sanc=CONTACT["fields"]["sanc"],
+            timestamp=timestamp,
+            eid=str(uuid.uuid4()),
+        ),
+    )
+
+
+def run(build_payload, messages):
+    queue_name = app.conf.task_default_queue
+    with app.connection_for_write() as conn:
+        queue = conn.SimpleQueue(queue_name, no_ack=True)
+
+        start = time.perf_counter()
+        for _ in range(messages):
+            build_payload().apply_async(connection=conn)
+        publish_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sizes = []
+        for _ in range(messages):
+            message = queue.get(block=False)
+            sizes.append(len(message.body))
+        consume_time = time.perf_counter() - start
+        queue.close()
+
+    return {
+        "content_type": message.content_type,
+        "body_bytes": sum(sizes) / len(sizes),
+        "published_per_second": messages / publish_time,
+        "consumed_per_second": messages / consume_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    app.conf.update(CELERY_BROKER_URL="memory://", CELERY_TASK_ALWAYS_EAGER=False)
+
+    results = {
+        "before": run(old_payload, args.messages),
+        "after": run(new_payload, args.messages),
+    }
+    results["body_size_reduction"] = 1 - (
+        results["after"]["body_bytes"] / results["before"]["body_bytes"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
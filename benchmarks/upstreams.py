@@ -0,0 +1,267 @@
+"""
+A local stand-in for the RapidPro, OpenHIM and WhatsApp APIs, with configurable
+latency and error rates, for benchmarking the registration process without calling
+the real services.
+
+All the services are served from the same address, so the app can be pointed at it
+with:
+
+    RAPIDPRO_URL=http://<address> OPENHIM_URL=http://<address>/ \\
+        WHATSAPP_URL=http://<address>
+
+Usage:
+    python benchmarks/upstreams.py --port 8080 --latency openhim=0.2 \\
+        --error-rate whatsapp=0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+UPSTREAMS = ("rapidpro", "openhim", "whatsapp")
+
+CONTACT = {
+    "uuid": "89341938-7c98-4c8e-bc9d-7cd8c9cfc468",
+    "name": None,
+    "language": None,
+    "urns": [],
+    "groups": [],
+    "fields": {},
+    "blocked": False,
+    "stopped": False,
+    "created_on": "2019-01-01T00:00:00.000000Z",
+    "modified_on": "2019-01-01T00:00:00.000000Z",
+}
+FLOW = {
+    "uuid": "9766a4c2-12c3-4eeb-9e39-912662918a9c",
+    "name": "Post Registration",
+    "type": "message",
+    "archived": False,
+    "labels": [],
+    "expires": 10080,
+    "runs": {"active": 0, "completed": 0, "interrupted": 0, "expired": 0},
+    "created_on": "2019-01-01T00:00:00.000000Z",
+    "modified_on": "2019-01-01T00:00:00.000000Z",
+}
+FLOW_START = {
+    "uuid": "09d23a05-47fe-11e4-bfe9-b8f6b119e9ab",
+    "flow": {"uuid": FLOW["uuid"], "name": FLOW["name"]},
+    "groups": [],
+    "contacts": [],
+    "restart_participants": False,
+    "status": "complete",
+    "extra": {},
+    "created_on": "2019-01-01T00:00:00.000000Z",
+    "modified_on": "2019-01-01T00:00:00.000000Z",
+}
+FACILITY = {
+    "title": "Facility Check Nurse Connect",
+    "headers": [],
+    "rows": [["123457", "yGVQRg2PXNh", "Test Clinic"]],
+    "width": 3,
+    "height": 1,
+}
+
+
+def page(results):
+    return {"next": None, "previous": None, "results": results}
+
+
+def get_contacts(query, body):
+    return page([])
+
+
+def save_contact(query, body):
+    contact = dict(CONTACT, uuid=str(uuid.uuid4()))
+    contact.update({key: value for key, value in body.items() if key in contact})
+    return contact
+
+
+def get_flows(query, body):
+    return page([FLOW])
+
+
+def create_flow_start(query, body):
+    return FLOW_START
+
+
+def facility_check(query, body):
+    [criteria] = query.get("criteria", ["value:"])
+    code = criteria.split(":", 1)[-1]
+    if code == "000000":
+        return {"title": "", "headers": [], "rows": [], "width": 0, "height": 0}
+    return dict(FACILITY, rows=[[code, "yGVQRg2PXNh", "Clinic {}".format(code)]])
+
+
+def subscription(query, body):
+    return {}
+
+
+def check_contacts(query, body):
+    return {
+        "contacts": [
+            {"input": address, "status": "valid", "wa_id": address.lstrip("+")}
+            for address in body.get("contacts", [])
+        ]
+    }
+
+
+# (method, path regex) -> (upstream, operation, handler)
+ROUTES = {
+    ("GET", r"^/api/v2/contacts\.json$"): ("rapidpro", "get_contacts", get_contacts),
+    ("POST", r"^/api/v2/contacts\.json$"): ("rapidpro", "save_contact", save_contact),
+    ("GET", r"^/api/v2/flows\.json$"): ("rapidpro", "get_flows", get_flows),
+    ("POST", r"^/api/v2/flow_starts\.json$"): (
+        "rapidpro",
+        "create_flow_start",
+        create_flow_start,
+    ),
+    ("GET", r"^/NCfacilityCheck$"): ("openhim", "facility_check", facility_check),
+    ("POST", r"^/nc/subscription$"): ("openhim", "subscription", subscription),
+    ("POST", r"^/v1/contacts$"): ("whatsapp", "contacts", check_contacts),
+}
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        for (route_method, pattern), route in ROUTES.items():
+            if route_method == method and re.match(pattern, url.path):
+                upstream, operation, handler = route
+                break
+        else:
+            return self.respond(404, {"detail": "Not found"})
+
+        self.server.record(upstream, operation)
+        latency = self.server.latency.get(upstream, 0)
+        if latency:
+            time.sleep(latency)
+        if random.random() < self.server.error_rate.get(upstream, 0):
+            self.server.record(upstream, operation, "error")
+            return self.respond(500, {"detail": "Injected error"})
+
+        data = handler(parse_qs(url.query), json.loads(body.decode() or "{}"))
+        self.respond(200, data)
+
+    def respond(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+class UpstreamServer(ThreadingMixIn, HTTPServer):
+    """
+    Serves the fake upstream APIs, and counts the requests made to each of them.
+
+    Args:
+        address (tuple): The (host, port) to listen on. Port 0 picks a free port
+        latency (dict): Seconds to wait before responding, by upstream name
+        error_rate (dict): Fraction of requests to fail, by upstream name
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=None, error_rate=None):
+        super().__init__(address, UpstreamHandler)
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, upstream, operation, result="request"):
+        with self.lock:
+            self.counts[(upstream, operation, result)] += 1
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+    @property
+    def environ(self):
+        """
+        The environment variables that point the app at these upstreams
+        """
+        return {
+            "RAPIDPRO_URL": self.url,
+            "OPENHIM_URL": self.url + "/",
+            "WHATSAPP_URL": self.url,
+        }
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def parse_upstream_values(values):
+    """
+    Parses a list of "upstream=value" strings into a dict
+    """
+    result = {}
+    for value in values:
+        upstream, _, number = value.partition("=")
+        if upstream not in UPSTREAMS:
+            raise argparse.ArgumentTypeError("Unknown upstream {}".format(upstream))
+        result[upstream] = float(number)
+    return result
+
+
+def add_upstream_arguments(parser):
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=SECONDS",
+        help="Delay before responding, eg. openhim=0.2",
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=FRACTION",
+        help="Fraction of requests to fail with a 500, eg. whatsapp=0.01",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    server = UpstreamServer(
+        (args.host, args.port),
+        latency=parse_upstream_values(args.latency),
+        error_rate=parse_upstream_values(args.error_rate),
+    )
+    print("Serving fake upstreams on {}".format(server.url), flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Settings for running the app locally for the benchmarks. These are the production
+settings, so the upstream URLs are read from the environment, but with an SQLite
+database unless DATABASE_URL is set.
+"""
+from nurseconnect_registration.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": env.db(  # noqa: F405
+        default="sqlite:////tmp/nurseconnect_registration_benchmark.db"
+    )
+}
+
+# Lets the benchmarks point the workers at a broker that needs no server, such as
+# kombu's filesystem transport
+CELERY_BROKER_TRANSPORT_OPTIONS = env.json(  # noqa: F405
+    "CELERY_BROKER_TRANSPORT_OPTIONS", default={}
+)
@@ -1,9 +1,8 @@
 import os
 
-import sentry_sdk
 from celery import Celery
-from django.conf import settings
-from sentry_sdk.integrations.celery import CeleryIntegration
+
+from nurseconnect_registration import worker_metrics  # noqa: F401
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nurseconnect_registration.settings")
 
@@ -11,8 +10,6 @@ app = Celery("nurseconnect_registration")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
-sentry_sdk.init(dsn=settings.SENTRY_DSN, integrations=[CeleryIntegration()])
-
 
 @app.task(bind=True)
 def debug_task(self):
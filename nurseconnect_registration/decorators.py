@@ -3,6 +3,18 @@ import functools
 from django.core.exceptions import PermissionDenied
 
 
+def is_internal(request):
+    """
+    Whether the request came from inside our network, rather than through the load
+    balancer.
+    """
+    forwards = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+    # The nginx in the docker container adds the loadbalancer IP to the list inside
+    # X-Forwarded-For, so if the list contains more than a single item, we know
+    # that it went through our loadbalancer
+    return len(forwards) <= 1
+
+
 def internal_only(view_func):
     """
     A view decorator which blocks access for requests coming through the load balancer.
@@ -10,11 +22,7 @@ def internal_only(view_func):
 
     @functools.wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        forwards = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
-        # The nginx in the docker container adds the loadbalancer IP to the list inside
-        # X-Forwarded-For, so if the list contains more than a single item, we know
-        # that it went through our loadbalancer
-        if len(forwards) > 1:
+        if not is_internal(request):
             raise PermissionDenied()
         return view_func(request, *args, **kwargs)
 
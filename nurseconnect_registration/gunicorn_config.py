@@ -0,0 +1,23 @@
+"""
+Gunicorn server hooks, which give each worker process its own upstream clients.
+Use with:
+
+    gunicorn --config python:nurseconnect_registration.gunicorn_config ...
+
+This matters with --preload, where the app, and any clients it built, are loaded
+in the master process before the workers are forked.
+"""
+
+
+def post_fork(server, worker):
+    # Imported here, since the config is loaded before the app
+    from registrations import clients
+
+    clients.reset()
+    clients.warm()
+
+
+def worker_exit(server, worker):
+    from registrations import clients
+
+    clients.close()
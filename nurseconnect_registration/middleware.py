@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from nurseconnect_registration.decorators import is_internal
+
+
+class ServerTimingMiddleware(object):
+    """
+    Adds the durations of the steps recorded in `request.server_timing` to the
+    Server-Timing header of the response, for internal requests or in debug mode.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        timings = getattr(request, "server_timing", None)
+        if timings and (settings.DEBUG or is_internal(request)):
+            response["Server-Timing"] = ", ".join(
+                "{};dur={:.1f}".format(name, duration * 1000)
+                for name, duration in timings
+            )
+        return response
@@ -14,6 +14,7 @@ import os
 
 import environ
 import sentry_sdk
+from sentry_sdk.integrations.celery import CeleryIntegration
 from sentry_sdk.integrations.django import DjangoIntegration
 
 env = environ.Env()
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "nurseconnect_registration.middleware.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -98,6 +100,8 @@ DATABASES = {
 
 PROMETHEUS_EXPORT_MIGRATIONS = False
 
+CACHES = {"default": env.cache(default="locmemcache://")}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -145,7 +149,8 @@ REST_FRAMEWORK = {
 }
 
 SENTRY_DSN = env("SENTRY_DSN", str, None)
-sentry_sdk.init(dsn=SENTRY_DSN, integrations=[DjangoIntegration()])
+# Initialised once here, for both the web processes and the Celery workers
+sentry_sdk.init(dsn=SENTRY_DSN, integrations=[DjangoIntegration(), CeleryIntegration()])
 
 RAPIDPRO_URL = env("RAPIDPRO_URL", str, "REPLACEME")
 RAPIDPRO_TOKEN = env("RAPIDPRO_TOKEN", str, "REPLACEME")
@@ -159,5 +164,13 @@ OPENHIM_PASSWORD = env("OPENHIM_PASSWORD", str, "REPLACEME")
 OPENHIM_AUTH = (OPENHIM_USERNAME, OPENHIM_PASSWORD)
 
 CELERY_BROKER_URL = env("CELERY_BROKER_URL", str, "amqp://")
+# The registration tasks are sent as msgpack, json is still accepted for other tasks
+CELERY_ACCEPT_CONTENT = ["json", "msgpack"]
+
+# The port that Celery workers serve their metrics on. Disabled if not set
+WORKER_METRICS_PORT = env("WORKER_METRICS_PORT", int, None)
 
 CLINIC_CODE_BLACKLIST = env("CLINIC_CODE_BLACKLIST", list, "123456")
+
+# How long, in seconds, repeat registrations for the same MSISDN are ignored for
+REGISTRATION_DEDUPE_TIMEOUT = env("REGISTRATION_DEDUPE_TIMEOUT", int, 60 * 60)
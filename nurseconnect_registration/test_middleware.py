@@ -0,0 +1,47 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from nurseconnect_registration.middleware import ServerTimingMiddleware
+
+
+def timed_view(request):
+    request.server_timing = [("first", 0.0123), ("second", 1.5)]
+    return HttpResponse()
+
+
+class ServerTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.middleware = ServerTimingMiddleware(timed_view)
+
+    def test_internal_request(self):
+        """
+        Internal requests should get the step timings in the Server-Timing header
+        """
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="1.2.3.4")
+        response = self.middleware(request)
+        self.assertEqual(response["Server-Timing"], "first;dur=12.3, second;dur=1500.0")
+
+    def test_external_request(self):
+        """
+        Requests through the load balancer should not get the Server-Timing header
+        """
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="1.2.3.4, 4.3.2.1")
+        response = self.middleware(request)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(DEBUG=True)
+    def test_external_request_debug(self):
+        """
+        In debug mode, all requests should get the Server-Timing header
+        """
+        request = RequestFactory().get("/", HTTP_X_FORWARDED_FOR="1.2.3.4, 4.3.2.1")
+        response = self.middleware(request)
+        self.assertIn("Server-Timing", response)
+
+    def test_no_timings(self):
+        """
+        If no steps were timed, the header should not be added
+        """
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().get("/"))
+        self.assertNotIn("Server-Timing", response)
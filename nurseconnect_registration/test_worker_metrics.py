@@ -0,0 +1,74 @@
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from prometheus_client import CollectorRegistry
+
+from nurseconnect_registration.worker_metrics import (
+    WorkerCollector,
+    build_registry,
+    start_metrics_server,
+)
+
+
+def fake_consumer():
+    consumer = mock.Mock()
+    consumer.pool.num_processes = 4
+    consumer.qos.value = 16
+    return consumer
+
+
+class WorkerCollectorTests(TestCase):
+    @mock.patch("nurseconnect_registration.worker_metrics.state")
+    def test_collect(self, state):
+        """
+        Should report the concurrency, prefetch limit, and the number of reserved and
+        active tasks of the worker
+        """
+        state.reserved_requests = {"task1", "task2", "task3"}
+        state.active_requests = {"task1"}
+        registry = CollectorRegistry()
+        registry.register(WorkerCollector(fake_consumer()))
+
+        self.assertEqual(registry.get_sample_value("celery_worker_concurrency"), 4)
+        self.assertEqual(registry.get_sample_value("celery_worker_prefetch_limit"), 16)
+        self.assertEqual(registry.get_sample_value("celery_worker_reserved_tasks"), 3)
+        self.assertEqual(registry.get_sample_value("celery_worker_active_tasks"), 1)
+
+
+class BuildRegistryTests(TestCase):
+    def test_multiprocess(self):
+        """
+        If the multiprocess directory is set, the metrics should be read from there,
+        instead of from the default registry
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.dict("os.environ", {"prometheus_multiproc_dir": directory}):
+                registry = build_registry(fake_consumer())
+            self.assertEqual(registry.get_sample_value("celery_worker_concurrency"), 4)
+            self.assertIsNone(
+                registry.get_sample_value("python_info", {"implementation": "CPython"})
+            )
+
+
+class StartMetricsServerTests(TestCase):
+    @override_settings(WORKER_METRICS_PORT=None)
+    @mock.patch("prometheus_client.start_http_server")
+    def test_disabled(self, start_http_server):
+        """
+        If no port is configured, the metrics server should not be started
+        """
+        start_metrics_server(sender=fake_consumer())
+        start_http_server.assert_not_called()
+
+    @override_settings(WORKER_METRICS_PORT=9100)
+    @mock.patch("nurseconnect_registration.worker_metrics.build_registry")
+    @mock.patch("prometheus_client.start_http_server")
+    def test_enabled(self, start_http_server, build_registry):
+        """
+        If a port is configured, the metrics server should be started on it
+        """
+        start_metrics_server(sender=fake_consumer())
+        start_http_server.assert_called_once_with(
+            9100, registry=build_registry.return_value
+        )
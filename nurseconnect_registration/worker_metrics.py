@@ -0,0 +1,100 @@
+"""
+Serves the Prometheus metrics of a Celery worker over HTTP.
+
+The prefork pool runs tasks in child processes, each with its own copy of the
+metrics. To combine them, run the worker with the `prometheus_multiproc_dir`
+environment variable set to an empty directory. Each process then writes its
+metrics to that directory, and the main worker process serves all of them, along
+with how full its prefetch buffer is.
+
+Set WORKER_METRICS_PORT to enable the exporter.
+"""
+import logging
+import os
+
+import prometheus_client
+from celery import signals
+from celery.worker import state
+from django.conf import settings
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+def multiprocess_dir():
+    return os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir")
+    )
+
+
+class WorkerCollector(object):
+    """
+    Collects the prefetch and concurrency usage of the worker's consumer. This lives
+    in the main worker process, so is not recorded in the multiprocess directory.
+    """
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+
+    def collect(self):
+        concurrency = GaugeMetricFamily(
+            "celery_worker_concurrency", "Number of pool processes or threads"
+        )
+        concurrency.add_metric([], self.consumer.pool.num_processes)
+        yield concurrency
+
+        prefetch = GaugeMetricFamily(
+            "celery_worker_prefetch_limit",
+            "Number of messages the worker may reserve from the broker",
+        )
+        qos = getattr(self.consumer, "qos", None)
+        prefetch.add_metric([], qos.value if qos is not None else 0)
+        yield prefetch
+
+        reserved = GaugeMetricFamily(
+            "celery_worker_reserved_tasks",
+            "Tasks received from the broker that haven't finished yet",
+        )
+        reserved.add_metric([], len(state.reserved_requests))
+        yield reserved
+
+        active = GaugeMetricFamily(
+            "celery_worker_active_tasks", "Tasks currently being run by the pool"
+        )
+        active.add_metric([], len(state.active_requests))
+        yield active
+
+
+def build_registry(consumer):
+    """
+    Returns the registry to serve for the worker. Without the multiprocess directory
+    this is the main process's default registry, which is only complete for the solo
+    pool.
+    """
+    if multiprocess_dir():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        logger.warning(
+            "prometheus_multiproc_dir is not set, metrics from pool processes will "
+            "not be exported"
+        )
+        registry = prometheus_client.REGISTRY
+    registry.register(WorkerCollector(consumer))
+    return registry
+
+
+@signals.worker_ready.connect
+def start_metrics_server(sender=None, **kwargs):
+    port = settings.WORKER_METRICS_PORT
+    if not port:
+        return
+    prometheus_client.start_http_server(port, registry=build_registry(sender))
+    logger.info("Exporting worker metrics on port %s", port)
+
+
+@signals.worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,127 @@
+"""
+Clients for the upstream services.
+
+Each client is built the first time it's used in a process, instead of when the
+module is imported. Processes that are forked after importing the app, such as
+gunicorn workers with --preload and Celery's prefork pool processes, then build
+their own clients, instead of sharing the parent's connection pools.
+
+Celery pool processes, and gunicorn workers using
+nurseconnect_registration.gunicorn_config, also build their clients when they
+start, and close them when they exit.
+"""
+import os
+
+import requests
+from celery import signals
+from django.conf import settings
+from temba_client.v2 import TembaClient
+from wabclient import Client as WABClient
+
+
+def _build_tembaclient():
+    return TembaClient(settings.RAPIDPRO_URL, settings.RAPIDPRO_TOKEN)
+
+
+def _build_wabclient():
+    # Short timeout since we're making these requests in the HTTP request
+    client = WABClient(url=settings.WHATSAPP_URL, timeout=2)
+    client.connection.set_token(settings.WHATSAPP_TOKEN)
+    return client
+
+
+def _build_openhim_session():
+    session = requests.Session()
+    session.auth = settings.OPENHIM_AUTH
+    session.headers.update({"User-Agent": "NurseConnectRegistration"})
+    return session
+
+
+BUILDERS = {
+    "rapidpro": _build_tembaclient,
+    "whatsapp": _build_wabclient,
+    "openhim": _build_openhim_session,
+}
+
+# name -> (pid, client)
+_clients = {}  # type: dict
+
+
+def _get_client(name):
+    """
+    Returns the client for this process, building it if it hasn't been built yet.
+
+    There's no lock around building the client, building one is cheap, so if two
+    threads race, one of the clients is just thrown away.
+    """
+    pid = os.getpid()
+    client_pid, client = _clients.get(name, (None, None))
+    if client_pid != pid:
+        client = BUILDERS[name]()
+        _clients[name] = (pid, client)
+    return client
+
+
+def _sessions(client):
+    """
+    The requests sessions, and so the connection pools, held by the client. The
+    RapidPro client doesn't keep a session, it makes a new connection per request.
+    """
+    if isinstance(client, requests.Session):
+        return [client]
+    session = getattr(getattr(client, "connection", None), "session", None)
+    return [session] if session is not None else []
+
+
+def get_tembaclient():
+    return _get_client("rapidpro")
+
+
+def get_wabclient():
+    return _get_client("whatsapp")
+
+
+def get_openhim_session():
+    return _get_client("openhim")
+
+
+def reset():
+    """
+    Forgets all the clients, without closing them. Used after forking, where the
+    clients and their sockets belong to the parent process, and closing them could
+    end the parent's connections.
+    """
+    _clients.clear()
+
+
+def warm():
+    """
+    Builds all the clients for this process, so that the first requests don't have
+    to
+    """
+    for name in BUILDERS:
+        _get_client(name)
+
+
+def close():
+    """
+    Closes the connection pools of the clients built by this process, and forgets
+    all the clients
+    """
+    pid = os.getpid()
+    for client_pid, client in _clients.values():
+        if client_pid == pid:
+            for session in _sessions(client):
+                session.close()
+    reset()
+
+
+@signals.worker_process_init.connect
+def init_worker_process(**kwargs):
+    reset()
+    warm()
+
+
+@signals.worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    close()
@@ -0,0 +1,157 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from registrations import clients
+
+# Seconds that importing the tasks and views may take, after Django is set up
+IMPORT_TIME_BUDGET = 1.0
+
+IMPORT_SCRIPT = """
+import json, time
+import django
+django.setup()
+start = time.perf_counter()
+import registrations.tasks, registrations.views
+duration = time.perf_counter() - start
+from registrations import clients
+print(json.dumps({"duration": duration, "clients": list(clients._clients)}))
+"""
+
+
+class OKHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def pooled_sockets(session, url):
+    """
+    The local addresses of the sockets in the session's connection pool for the URL
+    """
+    pool = session.get_adapter(url).poolmanager.connection_from_url(url)
+    return [
+        conn.sock.getsockname()
+        for conn in list(pool.pool.queue)
+        if conn is not None and conn.sock is not None
+    ]
+
+
+class ClientsTests(TestCase):
+    def setUp(self):
+        clients._clients.clear()
+
+    def tearDown(self):
+        clients._clients.clear()
+
+    def test_client_reused(self):
+        """
+        The client should only be built once in each process
+        """
+        self.assertIs(clients.get_tembaclient(), clients.get_tembaclient())
+        self.assertIs(clients.get_wabclient(), clients.get_wabclient())
+        self.assertIs(clients.get_openhim_session(), clients.get_openhim_session())
+
+    def test_client_rebuilt_after_fork(self):
+        """
+        A forked process should build its own client, instead of using the parent's
+        """
+        session = clients.get_openhim_session()
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            child_session = clients.get_openhim_session()
+        self.assertIsNot(session, child_session)
+
+    @override_settings(OPENHIM_AUTH=("user", "pass"))
+    def test_openhim_session(self):
+        """
+        The OpenHIM session should be built from the settings
+        """
+        session = clients.get_openhim_session()
+        self.assertEqual(session.auth, ("user", "pass"))
+        self.assertEqual(session.headers["User-Agent"], "NurseConnectRegistration")
+
+    def test_import_time(self):
+        """
+        Importing the app shouldn't build any clients, and should be within the
+        import time budget
+        """
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE="nurseconnect_registration.testsettings",
+            ),
+        )
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        self.assertEqual(result["clients"], [])
+        self.assertLess(result["duration"], IMPORT_TIME_BUDGET)
+
+    def test_close(self):
+        """
+        Closing should close the connection pools of this process's clients, and
+        forget them
+        """
+        session = clients.get_openhim_session()
+        with mock.patch.object(session, "close") as close:
+            clients.close()
+        close.assert_called_once_with()
+        self.assertEqual(clients._clients, {})
+
+    def test_forked_worker_process(self):
+        """
+        A forked worker process should start with its own clients, and not share
+        any sockets with the parent
+        """
+        server = HTTPServer(("127.0.0.1", 0), OKHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        self.addCleanup(server.server_close)
+        url = "http://127.0.0.1:{}/".format(server.server_address[1])
+
+        session = clients.get_openhim_session()
+        session.get(url)
+        parent_sockets = pooled_sockets(session, url)
+        self.assertEqual(len(parent_sockets), 1)
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            try:
+                os.close(read_fd)
+                clients.init_worker_process()
+                child_session = clients.get_openhim_session()
+                inherited = pooled_sockets(child_session, url)
+                child_session.get(url)
+                result = {
+                    "same_session": child_session is session,
+                    "inherited": inherited,
+                    "sockets": pooled_sockets(child_session, url),
+                }
+                with os.fdopen(write_fd, "w") as f:
+                    json.dump(result, f)
+            finally:
+                os._exit(0)
+
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            result = json.load(f)
+        os.waitpid(pid, 0)
+
+        self.assertFalse(result["same_session"])
+        self.assertEqual(result["inherited"], [])
+        self.assertEqual(len(result["sockets"]), 1)
+        self.assertNotIn(result["sockets"][0], [list(s) for s in parent_sockets])
@@ -8,6 +8,7 @@ from django import forms
 from django.conf import settings
 from temba_client.exceptions import TembaException
 
+from registrations.metrics import time_step, track_upstream
 from registrations.utils import contact_in_rapidpro_groups, get_rapidpro_contact
 from registrations.validators import clinic_code_blacklist_validator, msisdn_validator
 
@@ -67,7 +68,8 @@ class RegistrationDetailsForm(forms.Form):
 
         # Check if number already registered
         try:
-            contact = get_rapidpro_contact(formatted_msisdn)
+            with time_step(self.request, "msisdn_check"):
+                contact = get_rapidpro_contact(formatted_msisdn)
         except TembaException:
             raise forms.ValidationError(
                 "There was an error checking your details. Please try again."
@@ -86,14 +88,17 @@ class RegistrationDetailsForm(forms.Form):
 
         #  Check clinic code exists
         try:
-            response = requests.get(
-                urljoin(settings.OPENHIM_URL, "NCfacilityCheck"),
-                params={"criteria": "value:%s" % code},
-                auth=settings.OPENHIM_AUTH,
-                timeout=5,
-            )
-            response.raise_for_status()
-            data = response.json()
+            with time_step(self.request, "clinic_code_check"), track_upstream(
+                "openhim", "facility_check"
+            ):
+                response = requests.get(
+                    urljoin(settings.OPENHIM_URL, "NCfacilityCheck"),
+                    params={"criteria": "value:%s" % code},
+                    auth=settings.OPENHIM_AUTH,
+                    timeout=5,
+                )
+                response.raise_for_status()
+                data = response.json()
         except (requests.exceptions.HTTPError, JSONDecodeError):
             errors = self.request.session.get("jembi_api_errors", 0)
             self.request.session["jembi_api_errors"] = errors + 1
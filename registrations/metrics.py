@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+
+from celery import signals
+from prometheus_client import Counter, Gauge, Histogram
+
+UPSTREAM_REQUEST_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Time taken by requests to upstream services",
+    ["upstream", "operation"],
+)
+UPSTREAM_REQUEST_ERRORS = Counter(
+    "upstream_request_errors",
+    "Failed requests to upstream services",
+    ["upstream", "operation"],
+)
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Time taken to run Celery tasks", ["task"]
+)
+TASK_RETRIES = Counter("celery_task_retries", "Celery task retries", ["task"])
+TASKS_COMPLETED = Counter(
+    "celery_tasks_completed", "Celery task runs, by final state", ["task", "state"]
+)
+TASKS_IN_FLIGHT = Gauge(
+    "celery_tasks_in_flight",
+    "Celery tasks currently being run",
+    ["task"],
+    multiprocess_mode="livesum",
+)
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time between a Celery task being published and a worker starting it",
+    ["task"],
+)
+
+REGISTRATION_STEP_LATENCY = Histogram(
+    "registration_step_duration_seconds",
+    "Time taken by each step of handling a registration request",
+    ["step"],
+)
+
+
+@contextmanager
+def track_upstream(upstream, operation, errors=(Exception,)):
+    """
+    Records the latency of the request to the upstream service made inside the
+    block, and counts it as an error if it raises one of `errors`.
+
+    Args:
+        upstream (str): The service being called, eg. "rapidpro"
+        operation (str): The operation on that service, eg. "get_contacts"
+        errors (tuple): The exceptions which count as a failed request
+    """
+    start = time.monotonic()
+    try:
+        yield
+    except errors:
+        UPSTREAM_REQUEST_ERRORS.labels(upstream, operation).inc()
+        raise
+    finally:
+        UPSTREAM_REQUEST_LATENCY.labels(upstream, operation).observe(
+            time.monotonic() - start
+        )
+
+
+@contextmanager
+def time_step(request, step):
+    """
+    Records the time taken by the block as a step of handling the request. The step
+    is also added to `request.server_timing`, for the Server-Timing header.
+
+    Args:
+        request (HttpRequest): The request being handled, or None
+        step (str): The name of the step, eg. "clinic_code_check"
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - start
+        REGISTRATION_STEP_LATENCY.labels(step).observe(duration)
+        if request is not None:
+            if not hasattr(request, "server_timing"):
+                request.server_timing = []
+            request.server_timing.append((step, duration))
+
+
+_task_start_times = {}
+
+
+@signals.before_task_publish.connect
+def add_published_at_header(headers=None, **kwargs):
+    # Used to calculate how long the task waited in the queue. This is wall clock
+    # time, since it is compared across hosts
+    headers["published_at"] = time.time()
+
+
+@signals.task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    _task_start_times[task_id] = time.monotonic()
+    TASKS_IN_FLIGHT.labels(task.name).inc()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at is not None:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(time.time() - published_at, 0))
+
+
+@signals.task_postrun.connect
+def stop_task_timer(task_id=None, task=None, state=None, **kwargs):
+    start = _task_start_times.pop(task_id, None)
+    if start is not None:
+        TASK_DURATION.labels(task.name).observe(time.monotonic() - start)
+        TASKS_IN_FLIGHT.labels(task.name).dec()
+    TASKS_COMPLETED.labels(task.name, state or "UNKNOWN").inc()
+
+
+@signals.task_retry.connect
+def count_task_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(sender.name).inc()
@@ -0,0 +1,202 @@
+import time
+from unittest import mock
+from urllib.parse import urlencode
+
+import responses
+from django.test import TestCase
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from registrations.forms import RegistrationDetailsForm
+from registrations.metrics import start_task_timer, track_upstream
+from registrations.tasks import send_registration_to_openhim
+from registrations.views import RegistrationConfirmClinic
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TrackUpstreamTests(TestCase):
+    def test_latency_recorded(self):
+        """
+        The latency of the request should be recorded, and it shouldn't count as an
+        error if it succeeds
+        """
+        before = sample(
+            "upstream_request_duration_seconds_count", upstream="test", operation="ok"
+        )
+        with track_upstream("test", "ok"):
+            pass
+        self.assertEqual(
+            sample(
+                "upstream_request_duration_seconds_count",
+                upstream="test",
+                operation="ok",
+            ),
+            before + 1,
+        )
+        self.assertEqual(
+            sample("upstream_request_errors_total", upstream="test", operation="ok"), 0
+        )
+
+    def test_error_counted(self):
+        """
+        Only exceptions listed as errors should increment the error counter
+        """
+        with self.assertRaises(ValueError):
+            with track_upstream("test", "error", errors=(ValueError,)):
+                raise ValueError()
+        with self.assertRaises(KeyError):
+            with track_upstream("test", "error", errors=(ValueError,)):
+                raise KeyError()
+        self.assertEqual(
+            sample("upstream_request_errors_total", upstream="test", operation="error"),
+            1,
+        )
+        self.assertEqual(
+            sample(
+                "upstream_request_duration_seconds_count",
+                upstream="test",
+                operation="error",
+            ),
+            2,
+        )
+
+    @responses.activate
+    def test_facility_check_error(self):
+        """
+        A failed facility check should be counted as an OpenHIM error
+        """
+        responses.add(responses.GET, "http://testopenhim/NCfacilityCheck", status=500)
+        before = sample(
+            "upstream_request_errors_total",
+            upstream="openhim",
+            operation="facility_check",
+        )
+        r = self.client.get(reverse("registrations:registration-details"))
+        form = RegistrationDetailsForm(
+            {"clinic_code": "123457"}, request=r.wsgi_request
+        )
+        form.is_valid()
+        self.assertEqual(
+            sample(
+                "upstream_request_errors_total",
+                upstream="openhim",
+                operation="facility_check",
+            ),
+            before + 1,
+        )
+
+    @responses.activate
+    def test_whatsapp_invalid_contact_not_error(self):
+        """
+        A number that isn't on WhatsApp is a successful response, not an error
+        """
+        responses.add(
+            responses.POST,
+            "https://whatsapp.praekelt.org/v1/contacts",
+            json={"contacts": [{"input": "+27820001001", "status": "invalid"}]},
+        )
+        before = sample(
+            "upstream_request_errors_total", upstream="whatsapp", operation="contacts"
+        )
+        channel = RegistrationConfirmClinic().get_channel("+27820001001")
+        self.assertEqual(channel, "SMS")
+        self.assertEqual(
+            sample(
+                "upstream_request_errors_total",
+                upstream="whatsapp",
+                operation="contacts",
+            ),
+            before,
+        )
+
+
+class TaskMetricsTests(TestCase):
+    @responses.activate
+    def test_task_duration(self):
+        """
+        The duration and final state of each task run should be recorded
+        """
+        responses.add(responses.POST, "http://testopenhim/nc/subscription")
+        task = send_registration_to_openhim.name
+        before = sample("celery_task_duration_seconds_count", task=task)
+        before_success = sample(
+            "celery_tasks_completed_total", task=task, state="SUCCESS"
+        )
+        send_registration_to_openhim.delay(
+            ("+27820001001", "89341938-7c98-4c8e-bc9d-7cd8c9cfc468"),
+            None,
+            "SMS",
+            "123457",
+            None,
+            None,
+            1546300800,
+            "a1b2c3",
+        )
+        self.assertEqual(
+            sample("celery_task_duration_seconds_count", task=task), before + 1
+        )
+        self.assertEqual(
+            sample("celery_tasks_completed_total", task=task, state="SUCCESS"),
+            before_success + 1,
+        )
+        self.assertEqual(sample("celery_tasks_in_flight", task=task), 0)
+
+    def test_queue_wait(self):
+        """
+        If the task was published with a timestamp, the time it waited in the queue
+        should be recorded
+        """
+        task = mock.Mock()
+        task.name = "test_task"
+        task.request.published_at = time.time() - 5
+        start_task_timer(task_id="test-id", task=task)
+        self.assertEqual(
+            sample("celery_task_queue_wait_seconds_count", task="test_task"), 1
+        )
+        self.assertGreaterEqual(
+            sample("celery_task_queue_wait_seconds_sum", task="test_task"), 5
+        )
+
+
+class RegistrationStepTimingTests(TestCase):
+    @responses.activate
+    def test_details_steps(self):
+        """
+        The remote checks done when submitting the registration details should each
+        be timed, and returned in the Server-Timing header
+        """
+        responses.add(
+            responses.GET,
+            "https://test.rapidpro/api/v2/contacts.json",
+            json={"next": None, "previous": None, "results": []},
+        )
+        responses.add(
+            responses.GET,
+            "http://testopenhim/NCfacilityCheck?"
+            + urlencode({"criteria": "value:123457"}),
+            json={
+                "title": "Facility Check Nurse Connect",
+                "headers": [],
+                "rows": [["123457", "yGVQRg2PXNh", "Test Clinic"]],
+                "width": 3,
+                "height": 1,
+            },
+        )
+        before = sample("registration_step_duration_seconds_count", step="details_post")
+
+        r = self.client.post(
+            reverse("registrations:registration-details"),
+            {"msisdn": "0820001001", "clinic_code": "123457", "consent": ["True"]},
+        )
+        steps = [timing.split(";")[0] for timing in r["Server-Timing"].split(", ")]
+        self.assertEqual(
+            sorted(steps),
+            ["clinic_code_check", "details_post", "msisdn_check", "opt_out_check"],
+        )
+        self.assertEqual(
+            sample("registration_step_duration_seconds_count", step="details_post"),
+            before + 1,
+        )
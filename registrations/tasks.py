@@ -1,7 +1,6 @@
 from datetime import datetime
 from urllib.parse import urljoin
 
-import requests
 from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
 from requests.exceptions import RequestException
@@ -9,15 +8,9 @@ from temba_client.exceptions import TembaException
 from temba_client.utils import format_iso8601
 
 from nurseconnect_registration.celery import app
-from registrations.utils import (
-    get_rapidpro_contact,
-    get_rapidpro_flow_by_name,
-    tembaclient,
-)
-
-openhim_session = requests.Session()
-openhim_session.auth = settings.OPENHIM_AUTH
-openhim_session.headers.update({"User-Agent": "NurseConnectRegistration"})
+from registrations.clients import get_openhim_session, get_tembaclient
+from registrations.metrics import track_upstream
+from registrations.utils import get_rapidpro_contact, get_rapidpro_flow_by_name
 
 
 @app.task(
@@ -27,32 +20,36 @@ openhim_session.headers.update({"User-Agent": "NurseConnectRegistration"})
     acks_late=True,
     soft_time_limit=10,
     time_limit=15,
+    serializer="msgpack",
 )
 def send_registration_to_openhim(
     contact, referral_msisdn, channel, clinic_code, persal, sanc, timestamp, eid
 ):
     msisdn = contact[0]
     uuid = contact[1]
-    response = openhim_session.post(
-        url=urljoin(settings.OPENHIM_URL, "nc/subscription"),
-        json={
-            "mha": 1,
-            "swt": 7 if channel == "WhatsApp" else 1,
-            "type": 7,
-            "dmsisdn": referral_msisdn or msisdn,
-            "cmsisdn": msisdn,
-            "rmsisdn": None,
-            "faccode": clinic_code,
-            "id": "{}^^^ZAF^TEL".format(msisdn.lstrip("+")),
-            "dob": None,
-            "persal": persal,
-            "sanc": sanc,
-            "encdate": datetime.utcfromtimestamp(timestamp).strftime("%Y%m%d%H%M%S"),
-            "sid": uuid,
-            "eid": eid,
-        },
-    )
-    response.raise_for_status()
+    with track_upstream("openhim", "subscription"):
+        response = get_openhim_session().post(
+            url=urljoin(settings.OPENHIM_URL, "nc/subscription"),
+            json={
+                "mha": 1,
+                "swt": 7 if channel == "WhatsApp" else 1,
+                "type": 7,
+                "dmsisdn": referral_msisdn or msisdn,
+                "cmsisdn": msisdn,
+                "rmsisdn": None,
+                "faccode": clinic_code,
+                "id": "{}^^^ZAF^TEL".format(msisdn.lstrip("+")),
+                "dob": None,
+                "persal": persal,
+                "sanc": sanc,
+                "encdate": datetime.utcfromtimestamp(timestamp).strftime(
+                    "%Y%m%d%H%M%S"
+                ),
+                "sid": uuid,
+                "eid": eid,
+            },
+        )
+        response.raise_for_status()
     return (response.status_code, response.headers, response.content)
 
 
@@ -63,10 +60,13 @@ def send_registration_to_openhim(
     acks_late=True,
     soft_time_limit=10,
     time_limit=15,
+    serializer="msgpack",
 )
 def send_registration_to_rapidpro(
-    contact, msisdn, referral_msisdn, channel, clinic_code, timestamp
+    msisdn, referral_msisdn, channel, clinic_code, timestamp, contact=None
 ):
+    # contact is unused, and is only accepted so that messages queued by older
+    # releases, which sent the whole contact, can still be processed
     # Create/Update contact
     contact_data = {
         "preferred_channel": channel.lower(),
@@ -78,15 +78,18 @@ def send_registration_to_rapidpro(
     contact = get_rapidpro_contact(msisdn)  # Refresh contact so we don't recreate it
     if contact:
         uuid = contact.get("uuid")
-        contact = tembaclient.update_contact(uuid, fields=contact_data)
+        with track_upstream("rapidpro", "update_contact"):
+            contact = get_tembaclient().update_contact(uuid, fields=contact_data)
     else:
         urns = ["tel:%s" % msisdn]
         if channel == "WhatsApp":
             urns.append("whatsapp:%s" % msisdn.replace("+", ""))
-        contact = tembaclient.create_contact(urns=urns, fields=contact_data)
+        with track_upstream("rapidpro", "create_contact"):
+            contact = get_tembaclient().create_contact(urns=urns, fields=contact_data)
 
     # Start the contact on the registration flow
     flow = get_rapidpro_flow_by_name("post registration")
-    tembaclient.create_flow_start(flow.uuid, contacts=[contact.uuid])
+    with track_upstream("rapidpro", "create_flow_start"):
+        get_tembaclient().create_flow_start(flow.uuid, contacts=[contact.uuid])
 
     return (msisdn, contact.uuid)
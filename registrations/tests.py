@@ -6,6 +6,7 @@ from urllib.parse import urlencode
 
 import responses
 from django.contrib.messages import get_messages
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
@@ -396,6 +397,9 @@ class OptinConfirmTests(TestCase):
 
 
 class ClinicConfirmTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_redirect_on_invalid_session(self):
         """
         If there isn't a clinic name in the session, then we should redirect to the
@@ -425,6 +429,67 @@ class ClinicConfirmTests(TestCase):
         self.assertEqual(self.client.session["channel"], "WhatsApp")
         self.assertRedirects(r, reverse("registrations:success"))
 
+    @mock.patch("registrations.views.send_registration_to_openhim")
+    @mock.patch("registrations.views.send_registration_to_rapidpro")
+    @mock.patch("registrations.views.RegistrationConfirmClinic.get_channel")
+    def test_duplicate_registration(self, get_channel, rapidpro_task, openhim_task):
+        """
+        If the same MSISDN is submitted again within the dedupe window, we should
+        redirect to the success page without creating another registration
+        """
+        get_channel.return_value = "WhatsApp"
+        for _ in range(2):
+            session = self.client.session
+            session["clinic_name"] = "Test clinic"
+            session["registration_details"] = {
+                "msisdn": "+27820001001",
+                "clinic_code": "123457",
+            }
+            session["contact"] = {}
+            session.save()
+            r = self.client.post(
+                reverse("registrations:confirm-clinic"), {"yes": ["Yes"]}
+            )
+            self.assertEqual(self.client.session["channel"], "WhatsApp")
+            self.assertRedirects(r, reverse("registrations:success"))
+        rapidpro_task.s.assert_called_once()
+        openhim_task.s.assert_called_once()
+
+    @mock.patch("registrations.views.send_registration_to_openhim")
+    @mock.patch("registrations.views.send_registration_to_rapidpro")
+    @mock.patch("registrations.views.RegistrationConfirmClinic.get_channel")
+    def test_compact_task_arguments(self, get_channel, rapidpro_task, openhim_task):
+        """
+        The tasks should only be sent the details that they need, in types that
+        serialize compactly
+        """
+        get_channel.return_value = "SMS"
+        session = self.client.session
+        session["clinic_name"] = "Test clinic"
+        session["registration_details"] = {
+            "msisdn": "+27820001001",
+            "clinic_code": "123457",
+        }
+        session["contact"] = {
+            "uuid": "89341938-7c98-4c8e-bc9d-7cd8c9cfc468",
+            "groups": [],
+            "fields": {"persal": "testpersal", "sanc": "testsanc"},
+        }
+        session.save()
+        self.client.post(reverse("registrations:confirm-clinic"), {"yes": ["Yes"]})
+
+        [(_, rapidpro_kwargs)] = rapidpro_task.s.call_args_list
+        [(_, openhim_kwargs)] = openhim_task.s.call_args_list
+        self.assertEqual(
+            sorted(rapidpro_kwargs.keys()),
+            ["channel", "clinic_code", "msisdn", "referral_msisdn", "timestamp"],
+        )
+        self.assertIsInstance(rapidpro_kwargs["timestamp"], int)
+        self.assertEqual(openhim_kwargs["persal"], "testpersal")
+        self.assertEqual(openhim_kwargs["sanc"], "testsanc")
+        self.assertIsInstance(openhim_kwargs["timestamp"], int)
+        self.assertIsInstance(openhim_kwargs["eid"], str)
+
     def test_goes_to_homepage_no(self):
         """
         If "no" is selected, we should redirect to the registration details page, set
@@ -731,13 +796,9 @@ class ClinicConfirmTests(TestCase):
         msisdn = "+27820001001"
         clinic_code = "123457"
         registered_by = "+27820001002"
-        contact = {
-            "uuid": "89341938-7c98-4c8e-bc9d-7cd8c9cfc468",
-            "fields": {"persal": "testpersal", "sanc": "testsanc"},
-        }
 
         contact_info = send_registration_to_rapidpro(
-            contact, msisdn, registered_by, channel, clinic_code, timestamp
+            msisdn, registered_by, channel, clinic_code, timestamp
         )
         [rp_call_1, rp_contact_call, rp_call_3, rp_flow_start_call] = responses.calls
 
@@ -800,10 +861,9 @@ class ClinicConfirmTests(TestCase):
         msisdn = "+27820001001"
         clinic_code = "123457"
         registered_by = "+27820001002"
-        contact = {}
 
         contact_info = send_registration_to_rapidpro(
-            contact, msisdn, registered_by, channel, clinic_code, timestamp
+            msisdn, registered_by, channel, clinic_code, timestamp
         )
         [rp_call_1, rp_contact_call, rp_call_3, rp_flow_start_call] = responses.calls
 
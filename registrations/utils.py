@@ -2,9 +2,11 @@ import logging
 
 import phonenumbers
 from django.conf import settings
+from django.core.cache import cache
 from temba_client.exceptions import TembaException
-from temba_client.v2 import TembaClient
-from wabclient import Client as WABClient
+
+from registrations.clients import get_tembaclient
+from registrations.metrics import track_upstream
 
 
 def normalise_msisdn(msisdn):
@@ -14,7 +16,8 @@ def normalise_msisdn(msisdn):
 
 def get_rapidpro_contact(msisdn):
     try:
-        contact = tembaclient.get_contacts(urn="tel:%s" % msisdn).first()
+        with track_upstream("rapidpro", "get_contacts"):
+            contact = get_tembaclient().get_contacts(urn="tel:%s" % msisdn).first()
     except TembaException as e:
         logging.exception("Error connecting to RapidPro (msisdn: %s)" % msisdn)
         raise e
@@ -32,16 +35,23 @@ def contact_in_rapidpro_groups(contact, groups):
 
 
 def get_rapidpro_flow_by_name(name):
-    flows = tembaclient.get_flows().iterfetches()
-    for flow_batch in flows:
-        for flow in flow_batch:
-            if flow.name.lower() == name:
-                return flow
+    with track_upstream("rapidpro", "get_flows"):
+        flows = get_tembaclient().get_flows().iterfetches()
+        for flow_batch in flows:
+            for flow in flow_batch:
+                if flow.name.lower() == name:
+                    return flow
     return None
 
 
-tembaclient = TembaClient(settings.RAPIDPRO_URL, settings.RAPIDPRO_TOKEN)
+def claim_registration(msisdn):
+    """
+    Atomically claims the registration of the MSISDN, so that repeat submissions
+    within the dedupe window don't create duplicate registrations.
 
-# Short timeout since we're making these requests in the HTTP request
-wabclient = WABClient(url=settings.WHATSAPP_URL, timeout=2)
-wabclient.connection.set_token(settings.WHATSAPP_TOKEN)
+    Returns True if this is the first registration for the MSISDN in the window,
+    False if a registration for the MSISDN is already in flight.
+    """
+    return cache.add(
+        "registration:{}".format(msisdn), True, settings.REGISTRATION_DEDUPE_TIMEOUT
+    )
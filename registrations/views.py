@@ -12,21 +12,40 @@ from prometheus_client import Counter
 from requests.exceptions import RequestException
 from wabclient.exceptions import AddressException
 
+from registrations.clients import get_wabclient
 from registrations.forms import RegistrationDetailsForm
+from registrations.metrics import time_step, track_upstream
 from registrations.models import ReferralLink
 from registrations.tasks import (
     send_registration_to_openhim,
     send_registration_to_rapidpro,
 )
-from registrations.utils import contact_in_rapidpro_groups, wabclient
+from registrations.utils import claim_registration, contact_in_rapidpro_groups
 
 WHATSAPP_API_FAILURES = Counter("whatsapp_api_failures", "WhatsApp API failures")
 
 
-class RegistrationDetailsView(FormView):
+class StepTimingMixin(object):
+    """
+    Records the time taken to handle each request to the view, as the step
+    "<step_name>_<method>". The step name defaults to the view's class name.
+    """
+
+    step_name = ""
+
+    def dispatch(self, request, *args, **kwargs):
+        step = "{}_{}".format(
+            self.step_name or type(self).__name__, request.method.lower()
+        )
+        with time_step(request, step):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class RegistrationDetailsView(StepTimingMixin, FormView):
     form_class = RegistrationDetailsForm
     template_name = "registrations/registration_details.html"
     success_url = reverse_lazy("registrations:confirm-clinic")
+    step_name = "details"
 
     def dispatch(self, request, *args, **kwargs):
         try:
@@ -53,7 +72,9 @@ class RegistrationDetailsView(FormView):
         self.request.session["registration_details"] = form.cleaned_data
 
         contact = self.request.session["contact"]
-        if contact_in_rapidpro_groups(contact, ["opted-out"]):
+        with time_step(self.request, "opt_out_check"):
+            opted_out = contact_in_rapidpro_groups(contact, ["opted-out"])
+        if opted_out:
             return redirect(reverse_lazy("registrations:confirm-optin"))
         return super().form_valid(form)
 
@@ -63,8 +84,9 @@ class RegistrationDetailsView(FormView):
         return super().get_initial()
 
 
-class RegistrationConfirmOptIn(TemplateView):
+class RegistrationConfirmOptIn(StepTimingMixin, TemplateView):
     template_name = "registrations/confirm_optin.html"
+    step_name = "confirm_optin"
 
     def dispatch(self, request, *args, **kwargs):
         if (
@@ -85,8 +107,9 @@ class RegistrationConfirmOptIn(TemplateView):
         return redirect(reverse_lazy("registrations:reject-optin"))
 
 
-class RegistrationConfirmClinic(TemplateView):
+class RegistrationConfirmClinic(StepTimingMixin, TemplateView):
     template_name = "registrations/confirm_clinic.html"
+    step_name = "confirm_clinic"
 
     def dispatch(self, request, *args, **kwargs):
         if "clinic_name" not in request.session:
@@ -107,7 +130,8 @@ class RegistrationConfirmClinic(TemplateView):
             msisdn (str): The MSISDN to query
         """
         try:
-            wabclient.get_address(msisdn)
+            with track_upstream("whatsapp", "contacts", errors=(RequestException,)):
+                get_wabclient().get_address(msisdn)
             return "WhatsApp"
         except AddressException:
             return "SMS"
@@ -121,9 +145,10 @@ class RegistrationConfirmClinic(TemplateView):
             return redirect(reverse_lazy("registrations:registration-details"))
 
         try:
-            session["channel"] = self.get_channel(
-                request.session["registration_details"]["msisdn"]
-            )
+            with time_step(request, "channel_check"):
+                session["channel"] = self.get_channel(
+                    request.session["registration_details"]["msisdn"]
+                )
         except RequestException:
             WHATSAPP_API_FAILURES.inc()
 
@@ -141,31 +166,39 @@ class RegistrationConfirmClinic(TemplateView):
             )
             return redirect(reverse_lazy("registrations:confirm-clinic"))
 
-        chain(
-            send_registration_to_rapidpro.s(
-                contact=session["contact"],
-                msisdn=session["registration_details"]["msisdn"],
-                referral_msisdn=session.get("registered_by"),
-                channel=session["channel"],
-                clinic_code=session["registration_details"]["clinic_code"],
-                timestamp=datetime.utcnow().timestamp(),
-            ),
-            send_registration_to_openhim.s(
-                referral_msisdn=session.get("registered_by"),
-                channel=session["channel"],
-                clinic_code=session["registration_details"]["clinic_code"],
-                persal=session.get("contact", {}).get("fields", {}).get("persal", None),
-                sanc=session.get("contact", {}).get("fields", {}).get("sanc", None),
-                timestamp=datetime.utcnow().timestamp(),
-                eid=uuid.uuid4(),
-            ),
-        ).apply_async()
+        if not claim_registration(session["registration_details"]["msisdn"]):
+            # This MSISDN is already being registered, so return the same result
+            # without creating a duplicate registration
+            return redirect(reverse_lazy("registrations:success"))
+
+        timestamp = int(datetime.utcnow().timestamp())
+        contact_fields = session.get("contact", {}).get("fields", {})
+        with time_step(request, "enqueue"):
+            chain(
+                send_registration_to_rapidpro.s(
+                    msisdn=session["registration_details"]["msisdn"],
+                    referral_msisdn=session.get("registered_by"),
+                    channel=session["channel"],
+                    clinic_code=session["registration_details"]["clinic_code"],
+                    timestamp=timestamp,
+                ),
+                send_registration_to_openhim.s(
+                    referral_msisdn=session.get("registered_by"),
+                    channel=session["channel"],
+                    clinic_code=session["registration_details"]["clinic_code"],
+                    persal=contact_fields.get("persal", None),
+                    sanc=contact_fields.get("sanc", None),
+                    timestamp=timestamp,
+                    eid=str(uuid.uuid4()),
+                ),
+            ).apply_async()
 
         return redirect(reverse_lazy("registrations:success"))
 
 
-class RegistrationSuccess(TemplateView):
+class RegistrationSuccess(StepTimingMixin, TemplateView):
     template_name = "registrations/success.html"
+    step_name = "success"
 
     def dispatch(self, request, *args, **kwargs):
         if "channel" not in self.request.session:
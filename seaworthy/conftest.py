@@ -10,6 +10,12 @@ def pytest_addoption(parser):
         ),
         help="NurseConnect Registration image to test",
     )
+    parser.addoption(
+        "--performance-budgets",
+        action="store",
+        default=os.path.join(os.path.dirname(__file__), "performance_budgets.json"),
+        help="JSON file of the budgets that the performance tests must meet",
+    )
 
 
 def pytest_report_header(config):
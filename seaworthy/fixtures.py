@@ -9,17 +9,42 @@ NCREG_IMAGE = pytest.config.getoption("--ncreg-image")
 class NCRegContainer(ContainerDefinition):
     WAIT_PATTERNS = (r"Listening at: unix:/run/gunicorn/gunicorn.sock",)
 
-    def __init__(self, name, db_url, image=NCREG_IMAGE):
+    def __init__(self, name, db_url, image=NCREG_IMAGE, environment=None):
         super().__init__(name, image, self.WAIT_PATTERNS)
         self.db_url = db_url
+        self.environment = environment or {}
 
     def base_kwargs(self):
         return {
             "ports": {"8000/tcp": None},
-            "environment": {"DATABASE_URL": self.db_url},
+            "environment": dict({"DATABASE_URL": self.db_url}, **self.environment),
         }
 
 
+class UpstreamsContainer(ContainerDefinition):
+    """
+    Fake RapidPro, OpenHIM and WhatsApp APIs, from benchmarks/upstreams.py
+    """
+
+    WAIT_PATTERNS = (r"Serving fake upstreams",)
+    PORT = 8080
+
+    def __init__(self, name, image=NCREG_IMAGE):
+        super().__init__(name, image, self.WAIT_PATTERNS)
+
+    def base_kwargs(self):
+        return {
+            "command": ["python", "benchmarks/upstreams.py", "--port", str(self.PORT)]
+        }
+
+    def environment(self):
+        """
+        The environment variables that point the app at this container
+        """
+        url = "http://{}:{}".format(self.name, self.PORT)
+        return {"RAPIDPRO_URL": url, "OPENHIM_URL": url + "/", "WHATSAPP_URL": url}
+
+
 postgresql_container = PostgreSQLContainer("postgresql")
 f = postgresql_container.pytest_clean_fixtures("postgresql_container")
 postgresql_fixture, clean_postgresql_fixture = f
@@ -31,4 +56,23 @@ ncreg_fixture = ncreg_container.pytest_fixture(
     "ncreg_container", dependencies=["postgresql_container"]
 )
 
-__all__ = ["clean_postgresql_fixture", "ncreg_fixture", "postgresql_fixture"]
+upstreams_container = UpstreamsContainer("upstreams")
+upstreams_fixture = upstreams_container.pytest_fixture("upstreams_container")
+
+ncreg_performance_container = NCRegContainer(
+    "nurseconnect_registration_performance",
+    postgresql_container.database_url(),
+    environment=upstreams_container.environment(),
+)
+ncreg_performance_fixture = ncreg_performance_container.pytest_fixture(
+    "ncreg_performance_container",
+    dependencies=["postgresql_container", "upstreams_container"],
+)
+
+__all__ = [
+    "clean_postgresql_fixture",
+    "ncreg_fixture",
+    "ncreg_performance_fixture",
+    "postgresql_fixture",
+    "upstreams_fixture",
+]
@@ -0,0 +1,151 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from fixtures import *  # noqa: F401,F403
+from fixtures import NCRegContainer
+
+CSRF_REGEX = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+WARMUP_SECONDS = 2
+MEASURE_SECONDS = 10
+CONCURRENCY = 4
+
+
+@pytest.fixture(scope="module")
+def budgets():
+    with open(pytest.config.getoption("--performance-budgets")) as f:
+        return json.load(f)
+
+
+def base_url(container):
+    host, port = container.get_first_host_port()
+    return "http://{}:{}".format(host, port)
+
+
+def throughput(make_request, concurrency=CONCURRENCY):
+    """
+    Runs make_request(session) in a loop from each thread, and returns the number
+    of requests per second after the warmup. Every response must be successful.
+    """
+    stop = threading.Event()
+    counts = []
+
+    def worker():
+        count = 0
+        with requests.Session() as session:
+            warmup_end = time.monotonic() + WARMUP_SECONDS
+            while time.monotonic() < warmup_end:
+                make_request(session).raise_for_status()
+            while not stop.is_set():
+                make_request(session).raise_for_status()
+                count += 1
+        counts.append(count)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        time.sleep(WARMUP_SECONDS + MEASURE_SECONDS)
+        stop.set()
+        for future in futures:
+            future.result()
+    return sum(counts) / MEASURE_SECONDS
+
+
+def gunicorn_worker_rss(container):
+    """
+    Returns the RSS, in MB, of each gunicorn worker process in the container
+    """
+    top = container.inner().top(ps_args="-eo pid,ppid,rss,args")
+    processes = [dict(zip(top["Titles"], row)) for row in top["Processes"]]
+    gunicorn = {p["PID"]: p for p in processes if "gunicorn" in p["COMMAND"]}
+    return [int(p["RSS"]) / 1024 for p in gunicorn.values() if p["PPID"] in gunicorn]
+
+
+class TestPerformance:
+    def test_cold_start(
+        self, docker_helper, postgresql_container, upstreams_container, budgets
+    ):
+        """
+        The time from starting the container to it serving its first request should
+        be within budget
+        """
+        container = NCRegContainer(
+            "nurseconnect_registration_cold_start",
+            postgresql_container.database_url(),
+            environment=upstreams_container.environment(),
+        )
+        container.set_helper(docker_helper)
+        start = time.monotonic()
+        container.run()
+        try:
+            url = base_url(container)
+            deadline = start + budgets["cold_start_seconds"]
+            while time.monotonic() < deadline:
+                try:
+                    if requests.get(url, timeout=1).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                time.sleep(0.1)
+            cold_start = time.monotonic() - start
+        finally:
+            container.teardown()
+
+        assert cold_start < budgets["cold_start_seconds"]
+
+    def test_details_page_throughput(self, ncreg_performance_container, budgets):
+        """
+        The registration details page should be served within the throughput budget
+        """
+        url = base_url(ncreg_performance_container)
+        rate = throughput(lambda session: session.get(url))
+        assert rate >= budgets["details_page_requests_per_second"]
+
+    def test_details_submit_throughput(self, ncreg_performance_container, budgets):
+        """
+        Submitting the registration details, which checks the number and clinic
+        code against the fake upstreams, should be within the throughput budget
+        """
+        url = base_url(ncreg_performance_container)
+
+        def submit(session):
+            page = session.get(url)
+            page.raise_for_status()
+            return session.post(
+                url,
+                data={
+                    "csrfmiddlewaretoken": CSRF_REGEX.search(page.text).group(1),
+                    "msisdn": "0820001001",
+                    "clinic_code": "123457",
+                    "consent": "True",
+                },
+                allow_redirects=False,
+            )
+
+        # Each submission loads the page for the CSRF token, then posts the form
+        rate = throughput(submit)
+        assert rate >= budgets["details_submit_requests_per_second"]
+
+    def test_metrics_throughput(self, ncreg_performance_container, budgets):
+        """
+        The metrics endpoint should be served within the throughput budget
+        """
+        url = base_url(ncreg_performance_container) + "/metrics"
+        rate = throughput(lambda session: session.get(url))
+        assert rate >= budgets["metrics_requests_per_second"]
+
+    def test_gunicorn_worker_memory(self, ncreg_performance_container, budgets):
+        """
+        After serving requests, each gunicorn worker should be within the memory
+        budget
+        """
+        url = base_url(ncreg_performance_container)
+        throughput(lambda session: session.get(url))
+
+        rss = gunicorn_worker_rss(ncreg_performance_container)
+        assert rss
+        assert max(rss) <= budgets["gunicorn_worker_rss_mb"]
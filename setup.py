@@ -26,6 +26,7 @@ setup(
         # celery requires vine < 5, but doesn't specify
         "vine<5",
         "celery==4.3.0",
+        "msgpack==0.6.2",
         "sentry-sdk==0.7.10",
     ],
     classifiers=[